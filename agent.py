@@ -1,9 +1,14 @@
+import copy
 import os
 import sys
+from functools import lru_cache
+import onnxruntime
 from dotenv import load_dotenv
 from loguru import logger
+from pipecat.adapters.services.gemini_adapter import GeminiLLMAdapter
 from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.audio.vad.silero import VADParams
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
@@ -19,6 +24,146 @@ from tools import get_tools_schema, register_functions
 
 load_dotenv(override=True)
 
+# Service Configuration (from environment variables)
+DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GEMINI_MODEL_ID = os.getenv("GEMINI_MODEL_ID")
+ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
+ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID")
+
+# Pipeline Tuning (interim transcripts and metrics are off unless enabled)
+STT_INTERIM = os.getenv("STT_INTERIM", "0") == "1"
+PIPELINE_METRICS = os.getenv("PIPELINE_METRICS", "0") == "1"
+
+STT_LIVE_OPTIONS = LiveOptions(
+    encoding="linear16",
+    language="multi",
+    model="nova-3",
+    sample_rate=16000,
+    channels=1,
+    interim_results=STT_INTERIM,
+    smart_format=True,
+    punctuate=True,
+    vad_events=False,
+    numerals=True,
+)
+
+LLM_PARAMS = GoogleLLMService.InputParams(
+    temperature=0.5,
+    max_tokens=2000
+)
+
+TTS_PARAMS = ElevenLabsTTSService.InputParams(
+    stability=0.80,
+    similarity_boost=0.80,
+    style=0,
+    speed=1.0,
+    output_format="pcm_24000"
+)
+
+SYSTEM_PROMPT = """
+You are Lisa, a multilingual real-time voice-to-voice AI Agent created by and interacting with Shiv Singh.
+
+Persona:
+- Similar to Tony Stark's AI assistant EDITH: professional yet witty and tech-savvy
+- Address creator as Shiv Singh
+- Be attentive and responsive, show personality while staying professional
+
+Tools:
+- ALWAYS use the appropriate tool for weather, time, date and calendar queries
+- Do NOT make up information - only use data from tool responses
+- Ask for clarification when needed (e.g., which city for weather)
+
+Language and Style:
+- Default to Hindi (Use simple native Hindi script but include maximum English words in the native script)
+- Avoid complex Hindi words, prefer English alternatives
+- Keep responses under 80 words, this is a voice call with no visual elements
+- No code discussions (voice-only interaction) but can discuss logic
+- If Shiv says stop or excuse me, reply in maximum 1 word only
+"""
+
+# Only user/assistant turns live in the context; the system prompt is passed
+# to the LLM service. Gemini needs at least one turn, so each session starts
+# with a user turn that kicks off the greeting.
+GREETING_MESSAGE = "Greet Shiv Singh and introduce yourself."
+
+def _initial_messages():
+    """Return a fresh message list for a new session (the context mutates it)"""
+    return [{"role": "user", "content": GREETING_MESSAGE}]
+
+# Tools in Gemini's function-declaration format, converted once. The context
+# re-converts a ToolsSchema on every LLM turn but passes plain lists through.
+TOOLS_SCHEMA = GeminiLLMAdapter().to_provider_tools_format(get_tools_schema())
+
+VAD_PARAMS = VADParams(
+    confidence=0.75,
+    min_volume=0.75,
+    stop_secs=0.80,
+    threshold=0.78,
+    start_secs=0.15
+)
+
+
+# ONNX Runtime execution providers selectable through VAD_DEVICE
+VAD_PROVIDERS = {
+    "cuda": "CUDAExecutionProvider",
+    "coreml": "CoreMLExecutionProvider",
+}
+VAD_DEVICE = os.getenv("VAD_DEVICE", "cpu").lower()
+
+
+@lru_cache(maxsize=1)
+def _silero_stock():
+    """
+    Load the Silero ONNX model once per process.
+
+    Returns the stock analyzer that loaded it; its model is the one shared
+    by every SharedSileroVADAnalyzer, and its attributes are the reference
+    for the import-time state check below.
+    """
+    analyzer = SileroVADAnalyzer()
+    model = getattr(analyzer, "_model", None)
+    if not (hasattr(model, "session") and hasattr(model, "reset_states")):
+        raise RuntimeError("Unsupported pipecat-ai Silero internals; SharedSileroVADAnalyzer needs pipecat-ai==0.0.76")
+
+    provider = VAD_PROVIDERS.get(VAD_DEVICE)
+    if provider:
+        if not hasattr(model.session, "_model_path"):
+            raise RuntimeError("onnxruntime InferenceSession has no _model_path; cannot switch Silero VAD to " + provider)
+        if provider in onnxruntime.get_available_providers():
+            model.session = onnxruntime.InferenceSession(
+                model.session._model_path,
+                sess_options=model.session.get_session_options(),
+                providers=[provider, "CPUExecutionProvider"],
+            )
+            logger.info("Silero VAD running on {}", provider)
+        else:
+            logger.warning("{} not available, Silero VAD running on CPU", provider)
+
+    return analyzer
+
+
+class SharedSileroVADAnalyzer(SileroVADAnalyzer):
+    """
+    Silero VAD analyzer backed by a process-wide ONNX session.
+
+    The analyzer keeps per-stream state, so every connection still gets its
+    own instance; only the loaded inference session is shared.
+    """
+
+    def __init__(self, *, params=None):
+        VADAnalyzer.__init__(self, params=params)
+        self._model = copy.copy(_silero_stock()._model)
+        self._model.reset_states()
+        self._last_reset_time = 0
+
+
+# Load the model at import so the first connection doesn't pay for it.
+# SharedSileroVADAnalyzer rebuilds SileroVADAnalyzer's private state by hand;
+# fail at startup rather than mid-call if upstream's constructor changes
+if set(vars(SharedSileroVADAnalyzer())) != set(vars(_silero_stock())):
+    raise RuntimeError("SileroVADAnalyzer state changed upstream; SharedSileroVADAnalyzer needs pipecat-ai==0.0.76")
 
 
 async def run_bot(webrtc_connection):
@@ -27,135 +172,38 @@ async def run_bot(webrtc_connection):
         params=TransportParams(
             audio_in_enabled=True,
             audio_out_enabled=True,
-            vad_analyzer=SileroVADAnalyzer(
-                params=VADParams(
-                    confidence=0.75,
-                    min_volume=0.75,
-                    stop_secs=0.80,
-                    threshold=0.78,
-                    start_secs=0.15
-                )
-            ),
+            vad_analyzer=SharedSileroVADAnalyzer(params=VAD_PARAMS),
             audio_out_10ms_chunks=2,
         ),
     )
 
+    # Services hold per-session websockets/streams, so only their
+    # configuration is shared across connections
     stt = DeepgramSTTService(
-        api_key=os.getenv("DEEPGRAM_API_KEY"),
-        live_options=LiveOptions(
-            encoding="linear16",
-            language="multi",
-            model="nova-3",
-            sample_rate=16000,
-            channels=1,
-            interim_results=True,
-            smart_format=True,
-            punctuate=True,
-            vad_events=False,
-            numerals=True,
-        ),
+        api_key=DEEPGRAM_API_KEY,
+        live_options=STT_LIVE_OPTIONS,
     )
 
     llm = GoogleLLMService(
-        api_key=os.getenv("GOOGLE_API_KEY"),
-        model=os.getenv("GEMINI_MODEL_ID"),
-        params=GoogleLLMService.InputParams(
-            temperature=0.5,
-            max_tokens=2000
-        )
+        api_key=GOOGLE_API_KEY,
+        model=GEMINI_MODEL_ID,
+        # Sent as Gemini's system instruction so the static prefix stays
+        # identical across turns and is eligible for implicit prompt caching
+        system_instruction=SYSTEM_PROMPT,
+        params=LLM_PARAMS,
     )
 
     tts = ElevenLabsTTSService(
-        api_key=os.getenv("ELEVENLABS_API_KEY"),
-        voice_id=os.getenv("ELEVENLABS_VOICE_ID"),
-        model=os.getenv("ELEVENLABS_MODEL_ID"),
-        params=ElevenLabsTTSService.InputParams(
-            stability=0.80,
-            similarity_boost=0.80,
-            style=0,
-            speed=1.0,
-            output_format="pcm_24000"
-        )
+        api_key=ELEVENLABS_API_KEY,
+        voice_id=ELEVENLABS_VOICE_ID,
+        model=ELEVENLABS_MODEL_ID,
+        params=TTS_PARAMS,
     )
 
     # Register all functions from tools.py
     register_functions(llm)
 
-    messages = [
-        {
-            "role": "system",
-            "content": """
-You are a multilingual real-time voice-to-voice AI Agent, and your name is Lisa.
-
-Persona:
-- Similar to Tony Stark's AI assistant EDITH
-- Professional yet witty and tech-savvy
-- Created by and interacting with Shiv Singh
-- Do not hallucinate, only use accurate details from tool calls and do not make up any information
-
-Available Tools & When to Use:
-
-1. Weather Information (get_weather):
-- Use for ANY weather-related queries about any location worldwide
-- Provides temperature, conditions, humidity, and wind information
-- Examples: "What's the weather in Mumbai?", "How's the weather today?", "Is it raining in Delhi?"
-- Required: location (city/state/country)
-- Optional: unit (celsius/fahrenheit, defaults to celsius)
-
-2. Current Time & Date (get_current_time):
-- Use when asked about current time, date, or day
-- Always returns IST (Indian Standard Time)
-- Examples: "What time is it?", "What's today's date?", "What day is it?"
-- No parameters needed
-
-3. Date Calculations (get_date_info):
-- Use for date-related queries and calculations
-- Can get today, tomorrow, yesterday, or calculate future/past dates
-- Examples: "What's tomorrow's date?", "What day was 5 days ago?", "What will be the date in 10 days?"
-- Parameters: query_type (today/tomorrow/yesterday/days_from_now), days_offset (for calculations)
-
-4. Calendar Events (fetch_calendar_events):
-- Use to check Google Calendar events for any date
-- Returns events with times, titles, and details
-- Examples: "What's on my calendar today?", "Do I have meetings tomorrow?", "Show my events for 25th December"
-- Parameters: date_query ("today"/"tomorrow" or specific dates like "25-12-2024")
-
-5. Create Calendar Events (create_calendar_event):
-- Use to schedule new events in Google Calendar
-- Requires event title, start time, end time, and optional date
-- Examples: "Schedule a meeting at 2 PM", "Book dentist appointment tomorrow 10 AM to 11 AM"
-- Parameters: summary (event title), start_time ("2:30 PM"), end_time ("3:30 PM"), date (optional, defaults to today)
-
-Tool Usage Guidelines:
-- ALWAYS use the appropriate tool for the user's query
-- Do NOT make up information - only use data from tool responses
-- If multiple tools could apply, use the most specific one
-- Present information naturally in conversation
-
-Language and Style:
-- Default to Hindi (Use simple native Hindi script but include maximum English words in the native script)
-- Avoid complex Hindi words, prefer English alternatives
-- Keep responses under 80 words for voice interaction
-- No code discussions (voice-only interaction) but can discuss logic
-
-Interaction Guidelines:
-- Remember this is a voice call - no visual elements
-- Ask for clarification when needed (e.g., which city for weather)
-- Maintain EDITH-like personality traits
-- Address creator as Shiv Singh
-- Be attentive and responsive
-- Show personality while staying professional
-- If Shiv says stop or excuse me, reply in maximum 1 word only
-
-Remember: You're a voice AI assistant with powerful tools. Use them proactively to provide accurate, helpful information while maintaining natural conversation flow.
-"""
-        },
-    ]
-
-    # Get tools schema from tools.py
-    tools = get_tools_schema()
-
-    context = OpenAILLMContext(messages=messages, tools=tools)
+    context = OpenAILLMContext(messages=_initial_messages(), tools=TOOLS_SCHEMA)
     context_aggregator = llm.create_context_aggregator(context)
 
     # Create RTVI processor for client communication
@@ -176,8 +224,8 @@ Remember: You're a voice AI assistant with powerful tools. Use them proactively
         pipeline,
         params=PipelineParams(
             allow_interruptions=True,
-            enable_metrics=True,
-            enable_usage_metrics=True,
+            enable_metrics=PIPELINE_METRICS,
+            enable_usage_metrics=PIPELINE_METRICS,
         ),
         # Add RTVI observer to translate events
         observers=[RTVIObserver(rtvi)],
@@ -200,5 +248,5 @@ Remember: You're a voice AI assistant with powerful tools. Use them proactively
         logger.info("Pipecat Client disconnected")
         await task.cancel()
 
-    runner = PipelineRunner(handle_sigint=False, force_gc=True)
+    runner = PipelineRunner(handle_sigint=False, force_gc=False)
     await runner.run(task)
\ No newline at end of file
@@ -445,6 +445,11 @@ class LisaVoiceAgent {
             body: JSON.stringify({ sdp: offer.sdp, type: offer.type })
         });
         
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.detail || `Offer failed (${response.status})`);
+        }
+        
         const answer = await response.json();
         await pc.setRemoteDescription(answer);
         
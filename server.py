@@ -1,32 +1,62 @@
 import argparse
 import asyncio
+import base64
+import gc
+import hashlib
+import hmac
+import json
+import socket
 import sys
 import os
+import time
+from pathlib import Path
 from contextlib import asynccontextmanager
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from datetime import timedelta
 import uvicorn
 from agent import run_bot
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, status
-from fastapi.responses import FileResponse
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, Request, status
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 from pipecat.transports.network.webrtc_connection import IceServer, SmallWebRTCConnection
-import jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
-import requests
+import httpx
+import orjson
 
 
 load_dotenv(override=True)
 
+
+def configure_logging(level: str):
+    """Log to stderr from a background thread so sinks never block the event loop"""
+    logger.remove()
+    logger.add(sys.stderr, level=level, enqueue=True)
+
+
+# Configured at import so every uvicorn worker process gets the same sink.
+# --verbose passes VERBOSE_LOG_LEVEL to workers; .env never sets it, so
+# load_dotenv(override=True) can't clobber it the way it would LOG_LEVEL.
+LOG_LEVEL = (os.getenv("VERBOSE_LOG_LEVEL") or os.getenv("LOG_LEVEL", "DEBUG")).upper()
+configure_logging(LOG_LEVEL)
+
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 7
+# Every token we issue shares this header, so encode it once
+JWT_HEADER_B64 = base64.urlsafe_b64encode(
+    json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode()
+).rstrip(b"=")
+
+# Verified tokens -> (monotonic expiry, username), evicted oldest-first
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SIZE = 1024
+token_cache: Dict[str, Tuple[float, str]] = {}
 
 # Password Configuration
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -34,38 +64,138 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Admin User Configuration (from environment variables)
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
-ADMIN_PASSWORD_HASH = pwd_context.hash(ADMIN_PASSWORD)
+# Prefer a precomputed bcrypt hash so startup doesn't pay for hashing
+ADMIN_PASSWORD_HASH = os.getenv("ADMIN_PASSWORD_HASH") or pwd_context.hash(ADMIN_PASSWORD)
+
+# Recently verified credentials by HMAC(username, password) -> expiry
+AUTH_CACHE_TTL = 30
+auth_cache: Dict[str, float] = {}
 
 # reCAPTCHA Configuration
 RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY")
 RECAPTCHA_SITE_KEY = os.getenv("RECAPTCHA_SITE_KEY")
 RECAPTCHA_VERIFY_URL = "https://www.google.com/recaptcha/api/siteverify"
+RECAPTCHA_CACHE_TTL = 60
+
+# Shared HTTP client (pooled keep-alive connections, closed on shutdown)
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=10.0,
+    limits=httpx.Limits(max_keepalive_connections=20),
+)
+
+# Rejected reCAPTCHA tokens by sha256(token) -> expiry. Successes are never
+# cached: tokens are single-use and a cached pass could be replayed.
+recaptcha_cache: Dict[str, float] = {}
+
+# Session Configuration
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "8"))
+GC_INTERVAL_SECS = 60
+GC_THRESHOLDS = (100_000, 100, 100)  # Gen-0 collections this rare stay off the audio path
+
+# One slot per running bot, taken in /api/offer and released when it ends
+session_slots = asyncio.Semaphore(MAX_SESSIONS)
+
+# CORS Configuration (comma-separated list of allowed origins)
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
 
 # Security
 security = HTTPBearer()
 
-app = FastAPI()
 
-# Add CORS middleware
+async def collect_garbage():
+    """Run full GC collections on a fixed cadence instead of per-session teardown"""
+    while True:
+        await asyncio.sleep(GC_INTERVAL_SECS)
+        gc.collect()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Everything loaded so far (pipecat, models, tool schemas) lives for the
+    # whole process, so move it out of the collector's view
+    gc.collect()
+    gc.freeze()
+    gc.set_threshold(*GC_THRESHOLDS)
+    gc_task = asyncio.create_task(collect_garbage())
+    ice_task = asyncio.create_task(refresh_ice_servers())
+    yield  # Run app
+    gc_task.cancel()
+    ice_task.cancel()
+    coros = [pc.disconnect() for shard in pcs_shards for pc in shard.values()]
+    await asyncio.gather(*coros)
+    for shard in pcs_shards:
+        shard.clear()
+    await http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Add CORS middleware (the bundled UI is same-origin and needs none)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure this for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET", "POST"],
+    allow_headers=["authorization", "content-type"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="public"), name="static")
 
-# Store connections by pc_id
-pcs_map: Dict[str, SmallWebRTCConnection] = {}
-
-ice_servers = [
-    IceServer(urls="stun:stun.l.google.com:19302"),
-    IceServer(urls="stun:stun1.l.google.com:19302"),
-    IceServer(urls="stun:stun2.l.google.com:19302"),
-]
+# Serve the index page from memory with a strong ETag so reloads become 304s
+INDEX_BYTES = Path("public/index.html").read_bytes()
+INDEX_ETAG = f'"{hashlib.md5(INDEX_BYTES).hexdigest()}"'
+INDEX_HEADERS = {"etag": INDEX_ETAG, "cache-control": "public, max-age=60"}
+
+# Store connections by pc_id, sharded so connect/disconnect bursts only
+# contend on the lock of the shard they touch
+PCS_SHARD_COUNT = 16
+pcs_shards: List[Dict[str, SmallWebRTCConnection]] = [{} for _ in range(PCS_SHARD_COUNT)]
+pcs_locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(PCS_SHARD_COUNT)]
+
+def _shard_index(pc_id: str) -> int:
+    return hash(pc_id) % PCS_SHARD_COUNT
+
+async def get_connection(pc_id: str) -> Optional[SmallWebRTCConnection]:
+    index = _shard_index(pc_id)
+    async with pcs_locks[index]:
+        return pcs_shards[index].get(pc_id)
+
+async def put_connection(pc_id: str, connection: SmallWebRTCConnection):
+    index = _shard_index(pc_id)
+    async with pcs_locks[index]:
+        pcs_shards[index][pc_id] = connection
+
+async def pop_connection(pc_id: str) -> Optional[SmallWebRTCConnection]:
+    index = _shard_index(pc_id)
+    async with pcs_locks[index]:
+        return pcs_shards[index].pop(pc_id, None)
+
+ICE_STUN_HOSTS = ("stun.l.google.com", "stun1.l.google.com", "stun2.l.google.com")
+ICE_STUN_PORT = 19302
+ICE_REFRESH_SECS = 300
+
+def resolve_ice_servers() -> List[IceServer]:
+    """Resolve STUN hosts up front so new peer connections skip the DNS lookups"""
+    servers = []
+    for host in ICE_STUN_HOSTS:
+        try:
+            address = socket.gethostbyname(host)
+        except OSError as e:
+            logger.warning("Could not resolve {}, using hostname: {}", host, e)
+            address = host
+        servers.append(IceServer(urls=f"stun:{address}:{ICE_STUN_PORT}"))
+    return servers
+
+ice_servers = resolve_ice_servers()
+
+async def refresh_ice_servers():
+    """Re-resolve STUN hosts periodically to follow DNS changes"""
+    global ice_servers
+    while True:
+        await asyncio.sleep(ICE_REFRESH_SECS)
+        ice_servers = await asyncio.to_thread(resolve_ice_servers)
 
 # Pydantic models
 class LoginRequest(BaseModel):
@@ -81,6 +211,26 @@ class Token(BaseModel):
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def verify_credentials(username: str, password: str) -> bool:
+    """Check admin credentials, running bcrypt off the event loop"""
+    if username != ADMIN_USERNAME:
+        return False
+
+    # Never keep plaintext: remember successful logins by keyed digest only
+    key = hmac.new(SECRET_KEY.encode(), f"{username}\0{password}".encode(), hashlib.sha256).hexdigest()
+    now = time.monotonic()
+    expiry = auth_cache.get(key)
+    if expiry and expiry > now:
+        return True
+
+    if not await asyncio.to_thread(verify_password, password, ADMIN_PASSWORD_HASH):
+        return False
+
+    for stale in [k for k, e in auth_cache.items() if e <= now]:
+        del auth_cache[stale]
+    auth_cache[key] = now + AUTH_CACHE_TTL
+    return True
+
 async def verify_recaptcha(token: str) -> bool:
     """Verify reCAPTCHA token with Google's API"""
     if not RECAPTCHA_SECRET_KEY or not RECAPTCHA_SITE_KEY:
@@ -89,80 +239,126 @@ async def verify_recaptcha(token: str) -> bool:
     
     # Allow fallback tokens when reCAPTCHA is disabled/failed on client
     if token in ['disabled', 'fallback', 'error']:
-        logger.info(f"reCAPTCHA fallback token received: {token}")
+        logger.info("reCAPTCHA fallback token received: {}", token)
         return True
     
+    # Client retries resend the same token; reject known-bad ones without a round trip
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    if recaptcha_cache.get(token_key, 0) > time.monotonic():
+        return False
+
     try:
-        response = requests.post(RECAPTCHA_VERIFY_URL, data={
+        response = await http_client.post(RECAPTCHA_VERIFY_URL, data={
             'secret': RECAPTCHA_SECRET_KEY,
             'response': token
-        }, timeout=10)
+        })
         
         result = response.json()
         success = result.get('success', False)
         score = result.get('score', 0)
         
         # For reCAPTCHA v3, also check the score (0.0 to 1.0, higher is better)
-        if success and score >= 0.5:
-            logger.info(f"reCAPTCHA verification successful, score: {score}")
-            return True
+        verified = success and score >= 0.5
+        if verified:
+            logger.info("reCAPTCHA verification successful, score: {}", score)
         else:
-            logger.warning(f"reCAPTCHA verification failed, success: {success}, score: {score}")
-            return False
+            logger.warning("reCAPTCHA verification failed, success: {}, score: {}", success, score)
+
+        if not verified:
+            now = time.monotonic()
+            for key in [k for k, expiry in recaptcha_cache.items() if expiry <= now]:
+                del recaptcha_cache[key]
+            recaptcha_cache[token_key] = now + RECAPTCHA_CACHE_TTL
+        return verified
             
     except Exception as e:
-        logger.error(f"reCAPTCHA verification error: {e}")
+        logger.error("reCAPTCHA verification error: {}", e)
         return False
 
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    """Build an HS256 JWT directly: one json.dumps plus one HMAC-SHA256"""
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        lifetime = int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        lifetime = ACCESS_TOKEN_EXPIRE_DAYS * 86400
+    to_encode.update({"exp": int(time.time()) + lifetime})
+    payload_b64 = _b64url(json.dumps(to_encode, separators=(",", ":")).encode())
+    signing_input = JWT_HEADER_B64 + b"." + payload_b64
+    signature = hmac.new(SECRET_KEY.encode(), signing_input, hashlib.sha256).digest()
+    encoded_jwt = (signing_input + b"." + _b64url(signature)).decode()
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def _b64url_decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+def _auth_error(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_access_token(token: str) -> dict:
+    """Verify an HS256 token issued by create_access_token and return its payload"""
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None or username != ADMIN_USERNAME:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return username
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has expired",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except jwt.JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        header_b64, payload_b64, signature_b64 = token.encode().split(b".")
+        signature = _b64url_decode(signature_b64)
+    except ValueError:
+        raise _auth_error("Invalid authentication credentials")
+
+    # We only issue one header, so anything else (e.g. alg=none) is rejected
+    signing_input = header_b64 + b"." + payload_b64
+    expected = hmac.new(SECRET_KEY.encode(), signing_input, hashlib.sha256).digest()
+    if header_b64 != JWT_HEADER_B64 or not hmac.compare_digest(signature, expected):
+        raise _auth_error("Invalid authentication credentials")
+
+    try:
+        payload = orjson.loads(_b64url_decode(payload_b64))
+        expired = payload["exp"] < time.time()
+    except (ValueError, TypeError, KeyError):
+        raise _auth_error("Invalid authentication credentials")
+    if expired:
+        raise _auth_error("Token has expired")
+    return payload
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Async so FastAPI runs it on the event loop: no threadpool hop, and no
+    # concurrent threads racing on token_cache eviction
+    token = credentials.credentials
+    cached = token_cache.get(token)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    payload = decode_access_token(token)
+    username: str = payload.get("sub")
+    if username is None or username != ADMIN_USERNAME:
+        raise _auth_error("Invalid authentication credentials")
+
+    # Cache the decoded token, never past its own expiry
+    ttl = min(payload["exp"] - time.time(), TOKEN_CACHE_TTL)
+    if len(token_cache) >= TOKEN_CACHE_SIZE:
+        del token_cache[next(iter(token_cache))]
+    token_cache[token] = (time.monotonic() + ttl, username)
+    return username
 
 # Authentication endpoints
 @app.post("/api/login", response_model=Token)
 async def login(login_request: LoginRequest):
     # Verify reCAPTCHA first
     if not await verify_recaptcha(login_request.recaptcha_token):
-        logger.warning(f"reCAPTCHA verification failed for username: {login_request.username}")
+        logger.warning("reCAPTCHA verification failed for username: {}", login_request.username)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="reCAPTCHA verification failed. Please try again.",
         )
     
     # Verify username and password
-    if login_request.username != ADMIN_USERNAME or not verify_password(login_request.password, ADMIN_PASSWORD_HASH):
-        logger.warning(f"Failed login attempt for username: {login_request.username}")
+    if not await verify_credentials(login_request.username, login_request.password):
+        logger.warning("Failed login attempt for username: {}", login_request.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -175,7 +371,7 @@ async def login(login_request: LoginRequest):
         data={"sub": login_request.username}, expires_delta=access_token_expires
     )
     
-    logger.info(f"Successful login for user: {login_request.username}")
+    logger.info("Successful login for user: {}", login_request.username)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/verify-token")
@@ -190,43 +386,77 @@ async def get_recaptcha_config():
         "enabled": bool(RECAPTCHA_SECRET_KEY and RECAPTCHA_SITE_KEY)
     }
 
+async def run_bot_in_slot(webrtc_connection: SmallWebRTCConnection):
+    """Run a bot session and free its session slot when it ends"""
+    try:
+        await run_bot(webrtc_connection)
+    finally:
+        session_slots.release()
+
 @app.post("/api/offer")
-async def offer(request: dict, background_tasks: BackgroundTasks, current_user: str = Depends(verify_token)):
+async def offer(raw_request: Request, background_tasks: BackgroundTasks, current_user: str = Depends(verify_token)):
+    # Parse the SDP payload with orjson instead of FastAPI's stdlib json
+    try:
+        request = orjson.loads(await raw_request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid JSON body",
+        )
+    if not isinstance(request, dict) or not isinstance(request.get("sdp"), str) or not isinstance(request.get("type"), str):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON object with string 'sdp' and 'type' fields",
+        )
+
     pc_id = request.get("pc_id")
+    if pc_id is not None and not isinstance(pc_id, str):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'pc_id' must be a string",
+        )
+
+    pipecat_connection = await get_connection(pc_id) if pc_id else None
 
-    if pc_id and pc_id in pcs_map:
-        pipecat_connection = pcs_map[pc_id]
-        logger.info(f"Reusing existing connection for pc_id: {pc_id} (user: {current_user})")
+    if pipecat_connection:
+        logger.info("Reusing existing connection for pc_id: {} (user: {})", pc_id, current_user)
         await pipecat_connection.renegotiate(sdp=request["sdp"], type=request["type"])
     else:
-        pipecat_connection = SmallWebRTCConnection(ice_servers)
-        await pipecat_connection.initialize(sdp=request["sdp"], type=request["type"])
+        # Refuse new sessions up front rather than degrading the active ones
+        if session_slots.locked():
+            logger.warning("Rejecting connection, all {} sessions in use (user: {})", MAX_SESSIONS, current_user)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is at capacity. Please try again later.",
+            )
+        await session_slots.acquire()
+
+        try:
+            pipecat_connection = SmallWebRTCConnection(ice_servers)
+            await pipecat_connection.initialize(sdp=request["sdp"], type=request["type"])
+        except Exception:
+            session_slots.release()
+            raise
 
         @pipecat_connection.event_handler("closed")
         async def handle_disconnected(webrtc_connection: SmallWebRTCConnection):
-            logger.info(f"Discarding peer connection for pc_id: {webrtc_connection.pc_id}")
-            pcs_map.pop(webrtc_connection.pc_id, None)
+            logger.info("Discarding peer connection for pc_id: {}", webrtc_connection.pc_id)
+            await pop_connection(webrtc_connection.pc_id)
 
-        background_tasks.add_task(run_bot, pipecat_connection)
+        background_tasks.add_task(run_bot_in_slot, pipecat_connection)
 
     answer = pipecat_connection.get_answer()
     # Updating the peer connection inside the map
-    pcs_map[answer["pc_id"]] = pipecat_connection
+    await put_connection(answer["pc_id"], pipecat_connection)
 
     return answer
 
 
 @app.get("/")
-async def serve_index():
-    return FileResponse("public/index.html")
-
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    yield  # Run app
-    coros = [pc.disconnect() for pc in pcs_map.values()]
-    await asyncio.gather(*coros)
-    pcs_map.clear()
+async def serve_index(request: Request):
+    if request.headers.get("if-none-match") == INDEX_ETAG:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=INDEX_HEADERS)
+    return Response(INDEX_BYTES, media_type="text/html", headers=INDEX_HEADERS)
 
 
 if __name__ == "__main__":
@@ -237,13 +467,42 @@ if __name__ == "__main__":
     parser.add_argument(
         "--port", type=int, default=8000, help="Port for HTTP server (default: 8000)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Number of worker processes (default: $WEB_CONCURRENCY or 1)",
+    )
     parser.add_argument("--verbose", "-v", action="count")
     args = parser.parse_args()
 
-    logger.remove(0)
+    log_level = "info" if args.verbose else "warning"
     if args.verbose:
-        logger.add(sys.stderr, level="TRACE")
-    else:
-        logger.add(sys.stderr, level="DEBUG")
-
-    uvicorn.run(app, host=args.host, port=args.port)
+        # Inherited by worker processes, which configure logging at import
+        os.environ["VERBOSE_LOG_LEVEL"] = "TRACE"
+        configure_logging("TRACE")
+
+    if args.workers > 1:
+        # Hand over to the uvicorn CLI. Workers spawned from this script would
+        # re-import it as __mp_main__ and then again as server, and this
+        # process would keep the whole app loaded without serving anything.
+        os.execv(sys.executable, [
+            sys.executable, "-m", "uvicorn", "server:app",
+            "--app-dir", str(Path(__file__).resolve().parent),
+            "--host", args.host,
+            "--port", str(args.port),
+            "--workers", str(args.workers),
+            "--loop", "auto",
+            "--http", "auto",
+            "--log-level", log_level,
+        ])
+
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        # Picks uvloop and httptools when installed (uvicorn[standard])
+        loop="auto",
+        http="auto",
+        log_level=log_level,
+    )
@@ -2,9 +2,16 @@
 Tools module for Lisa AI Agent
 
 This module provides a modular tools system where each tool is defined in its own file.
-Tools are automatically discovered and registered.
+Tools register themselves with the @tool decorator when their module is imported;
+TOOLS lists the tool modules in registration order.
 """
 
+from . import weather, time, date, calendar
 from .register import get_tools_schema, register_functions
 
-__all__ = ['get_tools_schema', 'register_functions'] 
\ No newline at end of file
+TOOLS = (weather, time, date, calendar)
+
+# Every tool is registered by now; build the shared ToolsSchema up front
+get_tools_schema()
+
+__all__ = ['TOOLS', 'get_tools_schema', 'register_functions'] 
@@ -0,0 +1,20 @@
+"""
+Static tool registry for Lisa AI Agent
+
+Tool modules register their handlers with the @tool decorator when they are
+imported, so no filesystem scanning is needed to collect them.
+"""
+
+# Registered FunctionSchema objects, in registration order
+schemas = []
+
+# Registered handlers by function name
+handlers = {}
+
+def tool(schema):
+    """Register the decorated handler (taking FunctionCallParams and returning an awaitable) as the implementation of schema"""
+    def decorator(handler):
+        schemas.append(schema)
+        handlers[schema.name] = handler
+        return handler
+    return decorator
@@ -1,22 +1,81 @@
+import asyncio
 import datetime
+import re
+import threading
 from datetime import datetime, timedelta
-import pytz
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 from loguru import logger
 from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.services.llm_service import FunctionCallParams
+from ._registry import tool
+
+IST = ZoneInfo('Asia/Kolkata')
+
+# Ordinal suffix for each day of the month, indexed by day (index 0 unused)
+DAY_SUFFIX = (
+    'th', 'st', 'nd', 'rd', 'th', 'th', 'th', 'th',
+    'th', 'th', 'th', 'th', 'th', 'th', 'th', 'th',
+    'th', 'th', 'th', 'th', 'th', 'st', 'nd', 'rd',
+    'th', 'th', 'th', 'th', 'th', 'th', 'th', 'st',
+)
+
+MONTHS = (
+    '', 'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+)
+
+# Relative date words and their offset from today, in days
+DATE_OFFSETS = {'today': 0, 'tomorrow': 1, 'yesterday': -1}
+
+# Shared events payload for empty days (serialized as [] like a list)
+EMPTY_EVENTS = ()
+
+# 12-hour clock times such as "2:30 PM" or "9:00am"
+TIME_12H_RE = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])\s*$')
 
 try:
+    import httplib2
     from googleapiclient.discovery import build
     from google.oauth2.credentials import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
     GOOGLE_AVAILABLE = True
 except ImportError:
     GOOGLE_AVAILABLE = False
     logger.warning("Google Calendar libraries not available. Install with: pip install google-auth google-auth-oauthlib google-auth-httplib2 google-api-python-client")
 
+CALENDAR_READONLY_SCOPE = 'https://www.googleapis.com/auth/calendar.readonly'
+CALENDAR_SCOPE = 'https://www.googleapis.com/auth/calendar'
+CALENDAR_HTTP_TIMEOUT = 10
+
+@lru_cache(maxsize=2)
+def get_calendar_service(scope: str):
+    """Build the Calendar API client once per scope and reuse it.
+
+    Uses the discovery document bundled with google-api-python-client, so
+    building needs no network round trip. Requests go through one
+    long-lived authorized HTTP connection, so the TLS session to
+    www.googleapis.com is kept alive between tool calls. Credentials
+    refresh themselves when the access token expires.
+
+    Returns (service, lock). The client's httplib2 connection is not
+    thread-safe, so requests on it must hold its lock; each scope's client
+    has its own, so reads never wait behind inserts.
+    """
+    credentials = Credentials.from_authorized_user_file('token.json', [scope])
+    http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=CALENDAR_HTTP_TIMEOUT))
+    service = build('calendar', 'v3', http=http, cache_discovery=False, static_discovery=True)
+    return service, threading.Lock()
+
+def execute_request(lock, request):
+    """Execute a Calendar API request under its client's lock; call via asyncio.to_thread."""
+    with lock:
+        return request.execute()
+
 # Define the calendar events fetch function schema
 fetch_events_schema = FunctionSchema(
     name="fetch_calendar_events",
-    description="Fetch Google Calendar events for a specific date (today, tomorrow, or specific date)",
+    description="Fetch Google Calendar events with their times and titles for today, tomorrow, or a specific date. Use for questions like 'Do I have meetings tomorrow?' or 'Show my events for 25th December'",
     properties={
         "date_query": {
             "type": "string",
@@ -30,7 +89,7 @@ fetch_events_schema = FunctionSchema(
 # Define the calendar event creation function schema
 create_event_schema = FunctionSchema(
     name="create_calendar_event",
-    description="Create a new event in Google Calendar with natural language time input",
+    description="Create a new event in Google Calendar with natural language time input. Use when asked to schedule or book something, e.g. 'Book dentist appointment tomorrow 10 AM to 11 AM'",
     properties={
         "summary": {
             "type": "string",
@@ -53,18 +112,15 @@ create_event_schema = FunctionSchema(
     required=["summary", "start_time", "end_time"]
 )
 
-def get_date_range(date_query: str):
+def get_date_range(date_query: str, *, now=None):
     """Convert date query to start and end datetime objects."""
-    ist = pytz.timezone('Asia/Kolkata')
-    now = datetime.now(ist)
+    now = now or datetime.now(IST)
     today = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    if date_query.lower() == "today":
-        start_time = today
-        end_time = today + timedelta(days=1)
-    elif date_query.lower() == "tomorrow":
-        start_time = today + timedelta(days=1)
-        end_time = today + timedelta(days=2)
+    offset = DATE_OFFSETS.get(date_query.lower())
+    if offset is not None:
+        start_time = today + timedelta(days=offset)
+        end_time = start_time + timedelta(days=1)
     else:
         try:
             try:
@@ -72,7 +128,7 @@ def get_date_range(date_query: str):
             except ValueError:
                 specific_date = datetime.strptime(date_query, "%d-%m-%Y")
 
-            specific_date = ist.localize(specific_date)
+            specific_date = specific_date.replace(tzinfo=IST)
             start_time = specific_date.replace(hour=0, minute=0, second=0, microsecond=0)
             end_time = start_time + timedelta(days=1)
         except ValueError:
@@ -80,22 +136,36 @@ def get_date_range(date_query: str):
 
     return start_time, end_time
 
+def parse_12h_time(time_str: str):
+    """Parse a 12-hour clock time into (hour, minute) on the 24-hour clock."""
+    match = TIME_12H_RE.match(time_str)
+    if not match:
+        raise ValueError(f"Invalid 12-hour time: {time_str!r}")
+
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if not 1 <= hour <= 12 or minute > 59:
+        raise ValueError(f"Invalid 12-hour time: {time_str!r}")
+
+    hour %= 12
+    if match.group(3).upper() == "PM":
+        hour += 12
+    return hour, minute
+
 def format_event_time(event_datetime) -> str:
     """Format event time in a natural, conversational way."""
-    ist = pytz.timezone('Asia/Kolkata')
     if isinstance(event_datetime, str):
         event_datetime = datetime.fromisoformat(event_datetime.replace('Z', '+00:00'))
 
-    event_datetime = event_datetime.astimezone(ist)
-    hour = event_datetime.strftime("%I").lstrip("0")
-    minute = event_datetime.strftime("%M")
-    ampm = event_datetime.strftime("%p")
+    event_datetime = event_datetime.astimezone(IST)
+    hour = event_datetime.hour % 12 or 12
+    minute = event_datetime.minute
+    ampm = "PM" if event_datetime.hour >= 12 else "AM"
 
-    return f"{hour}:{minute} {ampm}" if minute != "00" else f"{hour} {ampm}"
+    return f"{hour}:{minute:02d} {ampm}" if minute else f"{hour} {ampm}"
 
-def format_date_for_speech(date_obj):
+def format_date_for_speech(date_obj, *, today=None):
     """Format date in a natural, conversational way."""
-    today = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+    today = today or datetime.now(IST).date()
     date_obj = date_obj.date() if isinstance(date_obj, datetime) else date_obj
 
     if date_obj == today:
@@ -104,9 +174,9 @@ def format_date_for_speech(date_obj):
         return "tomorrow"
     else:
         day = date_obj.day
-        suffix = "th" if 4 <= day <= 20 or 24 <= day <= 30 else ["st", "nd", "rd"][day % 10 - 1] if day % 10 in [1, 2, 3] else "th"
-        return f"{day}{suffix} {date_obj.strftime('%B')}"
+        return f"{day}{DAY_SUFFIX[day]} {MONTHS[date_obj.month]}"
 
+@tool(fetch_events_schema)
 async def fetch_calendar_events_handler(params: FunctionCallParams):
     """Fetch Google Calendar events for a specific date."""
     if not GOOGLE_AVAILABLE:
@@ -119,10 +189,10 @@ async def fetch_calendar_events_handler(params: FunctionCallParams):
     try:
         date_query = params.arguments.get("date_query", "today")
         
-        credentials = Credentials.from_authorized_user_file('token.json', ['https://www.googleapis.com/auth/calendar.readonly'])
-        service = build('calendar', 'v3', credentials=credentials)
+        service, lock = get_calendar_service(CALENDAR_READONLY_SCOPE)
 
-        start_time, end_time = get_date_range(date_query)
+        now = datetime.now(IST)
+        start_time, end_time = get_date_range(date_query, now=now)
         if not start_time or not end_time:
             await params.result_callback({
                 "status": "error",
@@ -130,44 +200,35 @@ async def fetch_calendar_events_handler(params: FunctionCallParams):
             })
             return
 
-        events_result = service.events().list(
+        # Run the blocking HTTP call off the event loop shared with the audio pipeline
+        events_result = await asyncio.to_thread(execute_request, lock, service.events().list(
             calendarId='primary',
             timeMin=start_time.isoformat(),
             timeMax=end_time.isoformat(),
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
+        ))
 
         events = events_result.get('items', [])
-        date_str = format_date_for_speech(start_time)
+        date_str = format_date_for_speech(start_time, today=now.date())
 
         if not events:
             await params.result_callback({
                 "status": "success",
                 "date": date_str,
-                "events": [],
+                "events": EMPTY_EVENTS,
                 "message": f"You have no events scheduled for {date_str}."
             })
             return
 
-        formatted_events = []
-        for event in events:
-            summary = event.get('summary', 'Unnamed Event')
-            start = event['start'].get('dateTime', event['start'].get('date'))
-
-            if 'T' in start:
-                time_str = format_event_time(start)
-                formatted_events.append({
-                    "summary": summary,
-                    "time": time_str,
-                    "is_all_day": False
-                })
-            else:
-                formatted_events.append({
-                    "summary": summary,
-                    "time": "all day",
-                    "is_all_day": True
-                })
+        # Timed events carry 'dateTime'; all-day events only have 'date'
+        fmt = format_event_time
+        formatted_events = [
+            {"summary": event.get('summary', 'Unnamed Event'), "time": fmt(start), "is_all_day": False}
+            if (start := event['start'].get('dateTime')) else
+            {"summary": event.get('summary', 'Unnamed Event'), "time": "all day", "is_all_day": True}
+            for event in events
+        ]
 
         await params.result_callback({
             "status": "success",
@@ -183,6 +244,7 @@ async def fetch_calendar_events_handler(params: FunctionCallParams):
             "message": "I'm having trouble accessing your calendar right now."
         })
 
+@tool(create_event_schema)
 async def create_calendar_event_handler(params: FunctionCallParams):
     """Create a new event in Google Calendar."""
     if not GOOGLE_AVAILABLE:
@@ -205,17 +267,15 @@ async def create_calendar_event_handler(params: FunctionCallParams):
             })
             return
 
-        credentials = Credentials.from_authorized_user_file('token.json', ['https://www.googleapis.com/auth/calendar'])
-        service = build('calendar', 'v3', credentials=credentials)
+        service, lock = get_calendar_service(CALENDAR_SCOPE)
 
-        ist = pytz.timezone('Asia/Kolkata')
-        now = datetime.now(ist)
+        now = datetime.now(IST)
+        today = now.date()
 
         # Get the target date
-        if date.lower() == "today":
-            target_date = now.date()
-        elif date.lower() == "tomorrow":
-            target_date = (now + timedelta(days=1)).date()
+        offset = DATE_OFFSETS.get(date.lower())
+        if offset is not None:
+            target_date = today + timedelta(days=offset)
         else:
             try:
                 # Try parsing both date formats
@@ -231,13 +291,13 @@ async def create_calendar_event_handler(params: FunctionCallParams):
                 return
 
         try:
-            start_dt = datetime.strptime(start_time, "%I:%M %p").replace(
-                year=target_date.year, month=target_date.month, day=target_date.day)
-            end_dt = datetime.strptime(end_time, "%I:%M %p").replace(
-                year=target_date.year, month=target_date.month, day=target_date.day)
+            start_hour, start_minute = parse_12h_time(start_time)
+            end_hour, end_minute = parse_12h_time(end_time)
 
-            start_dt = ist.localize(start_dt)
-            end_dt = ist.localize(end_dt)
+            start_dt = datetime(
+                target_date.year, target_date.month, target_date.day, start_hour, start_minute, tzinfo=IST)
+            end_dt = datetime(
+                target_date.year, target_date.month, target_date.day, end_hour, end_minute, tzinfo=IST)
 
             if end_dt < start_dt:
                 end_dt += timedelta(days=1)
@@ -268,10 +328,12 @@ async def create_calendar_event_handler(params: FunctionCallParams):
             },
         }
 
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
+        created_event = await asyncio.to_thread(
+            execute_request, lock, service.events().insert(calendarId='primary', body=event)
+        )
 
         time_str = format_event_time(start_dt)
-        date_str = format_date_for_speech(start_dt)
+        date_str = format_date_for_speech(start_dt, today=today)
         
         await params.result_callback({
             "status": "success",
@@ -288,17 +350,3 @@ async def create_calendar_event_handler(params: FunctionCallParams):
             "status": "error",
             "message": "I couldn't create that event. Please try again with a different time."
         })
-
-# For the modular tools system, we need to export the schemas and handlers
-# Since we have multiple functions, we'll use the fetch events as the primary one
-SCHEMA = fetch_events_schema
-FUNCTION_NAME = "fetch_calendar_events"
-
-async def handler(params: FunctionCallParams):
-    """Primary handler for calendar events fetching"""
-    await fetch_calendar_events_handler(params)
-
-# Additional exports for the create event function
-CREATE_SCHEMA = create_event_schema
-CREATE_FUNCTION_NAME = "create_calendar_event"
-CREATE_HANDLER = create_calendar_event_handler 
\ No newline at end of file
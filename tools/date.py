@@ -1,13 +1,16 @@
 from datetime import datetime, timedelta
-import pytz
+from zoneinfo import ZoneInfo
 from loguru import logger
 from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.services.llm_service import FunctionCallParams
+from ._registry import tool
+
+IST = ZoneInfo('Asia/Kolkata')
 
 # Define the date calculation function schema
 SCHEMA = FunctionSchema(
     name="get_date_info",
-    description="Get date information, calculate dates relative to today, or get specific date details",
+    description="Get date information or calculate dates relative to today (tomorrow, yesterday, N days from now or ago). Use for questions like 'What day was 5 days ago?' or 'What will be the date in 10 days?'",
     properties={
         "query_type": {
             "type": "string",
@@ -24,12 +27,12 @@ SCHEMA = FunctionSchema(
     required=["query_type"]
 )
 
+@tool(SCHEMA)
 async def handler(params: FunctionCallParams):
     """Handle date information requests"""
     try:
         # Get current time in IST
-        ist = pytz.timezone('Asia/Kolkata')
-        now = datetime.now(ist)
+        now = datetime.now(IST)
         
         query_type = params.arguments.get("query_type", "today")
         days_offset = params.arguments.get("days_offset", 0)
@@ -73,6 +76,3 @@ async def handler(params: FunctionCallParams):
         await params.result_callback({
             "error": "Unable to get date information. Please try again."
         })
-
-# Export the function name for automatic registration
-FUNCTION_NAME = "get_date_info" 
\ No newline at end of file
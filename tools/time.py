@@ -1,35 +1,44 @@
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 from loguru import logger
 from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.services.llm_service import FunctionCallParams
+from ._registry import tool
+
+IST = ZoneInfo('Asia/Kolkata')
+
+MONTHS = (
+    '', 'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+)
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
 
 # Define the current time function schema
 SCHEMA = FunctionSchema(
     name="get_current_time",
-    description="Get current date, time, and day of the week in Indian Standard Time (IST)",
+    description="Get current date, time, and day of the week in Indian Standard Time (IST). Use when asked what time, date, or day it is",
     properties={},
     required=[]
 )
 
+@tool(SCHEMA)
 async def handler(params: FunctionCallParams):
     """Get current date, time, and day in IST"""
     try:
         # Get current time in IST
-        ist = pytz.timezone('Asia/Kolkata')
-        now = datetime.now(ist)
+        now = datetime.now(IST)
         
-        # Format the time data
-        current_date = now.strftime("%B %d, %Y")  # e.g., "January 15, 2024"
-        current_time = now.strftime("%I:%M %p")   # e.g., "2:30 PM"
-        current_day = now.strftime("%A")          # e.g., "Monday"
+        # Format the time data from the datetime fields (no locale lookups)
+        current_date = f"{MONTHS[now.month]} {now.day:02d}, {now.year}"  # e.g., "January 15, 2024"
+        current_time = f"{now.hour % 12 or 12:02d}:{now.minute:02d} {'PM' if now.hour >= 12 else 'AM'}"  # e.g., "02:30 PM"
+        current_day = DAYS[now.weekday()]                                 # e.g., "Monday"
         
         time_data = {
             "date": current_date,
             "time": current_time,
             "day": current_day,
             "timezone": "IST",
-            "full_datetime": now.strftime("%A, %B %d, %Y at %I:%M %p IST"),
+            "full_datetime": f"{current_day}, {current_date} at {current_time} IST",
             "description": f"Today is {current_day}, {current_date}, and the current time is {current_time} IST"
         }
         
@@ -40,6 +49,3 @@ async def handler(params: FunctionCallParams):
         await params.result_callback({
             "error": "Unable to get current time. Please try again."
         })
-
-# Export the function name for automatic registration
-FUNCTION_NAME = "get_current_time" 
\ No newline at end of file
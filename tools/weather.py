@@ -1,12 +1,13 @@
-import random
+import numpy as np
 from loguru import logger
 from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.services.llm_service import FunctionCallParams
+from ._registry import tool
 
 # Define the weather function schema
 SCHEMA = FunctionSchema(
     name="get_weather",
-    description="Get current weather information for any location worldwide",
+    description="Get current weather information (temperature, conditions, humidity, wind) for any location worldwide. Use for any weather question, e.g. 'Is it raining in Delhi?'",
     properties={
         "location": {
             "type": "string",
@@ -22,44 +23,72 @@ SCHEMA = FunctionSchema(
     required=["location"]
 )
 
-async def handler(params: FunctionCallParams):
-    """Fake weather function that returns random weather data"""
-    try:
-        location = params.arguments.get("location", "Unknown Location")
-        unit = params.arguments.get("unit", "celsius")
-        
-        # Generate fake weather data
-        conditions = random.choice([
-            "sunny", "partly cloudy", "cloudy", "rainy", 
-            "stormy", "snowy", "foggy", "windy"
-        ])
-        
-        if unit == "fahrenheit":
-            temperature = random.randint(16, 29)  # 16-29°F
-            temp_str = f"{temperature}°F"
-        else:
-            temperature = random.randint(0, 10)   # 0-10°C
-            temp_str = f"{temperature}°C"
-        
-        humidity = random.randint(30, 90)
-        wind_speed = random.randint(5, 25)
+CONDITIONS = (
+    "sunny", "partly cloudy", "cloudy", "rainy",
+    "stormy", "snowy", "foggy", "windy"
+)
+
+# Every possible reading, pre-formatted for the response
+TEMP_C = tuple(f"{t}°C" for t in range(0, 11))
+TEMP_F = tuple(f"{t}°F" for t in range(16, 30))
+HUMID = tuple(f"{h}%" for h in range(30, 91))
+WIND = tuple(f"{w} km/h" for w in range(5, 26))
+
+# Fake readings are drawn in batches and handed out one per call
+SAMPLE_BATCH = 4096
+_rng = np.random.default_rng()
+_samples = []
+
+def _draw(values):
+    """Draw SAMPLE_BATCH values uniformly from a table"""
+    return [values[i] for i in _rng.integers(0, len(values), SAMPLE_BATCH).tolist()]
+
+def _refill_samples():
+    """Draw the next batch of (conditions, °C, °F, humidity, wind) readings"""
+    _samples.extend(zip(_draw(CONDITIONS), _draw(TEMP_C), _draw(TEMP_F), _draw(HUMID), _draw(WIND)))
+
+def _specialize(temp_slot):
+    """Build the handler for one unit; temp_slot picks the reading's °C or °F field"""
+    async def unit_handler(params: FunctionCallParams, location: str):
+        # Take the next pre-drawn fake reading
+        if not _samples:
+            _refill_samples()
+        reading = _samples.pop()
+        conditions = reading[0]
+        temp_str = reading[temp_slot]
         
         weather_data = {
             "location": location,
             "temperature": temp_str,
             "conditions": conditions,
-            "humidity": f"{humidity}%",
-            "wind_speed": f"{wind_speed} km/h",
+            "humidity": reading[3],
+            "wind_speed": reading[4],
             "description": f"It's currently {conditions} in {location} with a temperature of {temp_str}"
         }
         
-        await params.result_callback(weather_data)
-        
-    except Exception as e:
-        logger.error(f"Weather function error: {e}")
-        await params.result_callback({
-            "error": f"Unable to get weather for {location}. Please try again."
-        })
+        result_callback = params.result_callback
+        try:
+            await result_callback(weather_data)
+        except Exception as e:
+            logger.error("Weather function error: {}", e)
+            await result_callback({
+                "error": f"Unable to get weather for {location}. Please try again."
+            })
+    return unit_handler
+
+_handler_c = _specialize(1)
+_handler_f = _specialize(2)
+
+# Unknown units fall back to celsius
+_DISPATCH = {"celsius": _handler_c, "fahrenheit": _handler_f}
+
+@tool(SCHEMA)
+def handler(params: FunctionCallParams):
+    """Fake weather function that returns random weather data
 
-# Export the function name for automatic registration
-FUNCTION_NAME = "get_weather" 
\ No newline at end of file
+    Returns the unit handler's coroutine for pipecat to await, so no extra
+    coroutine frame wraps it.
+    """
+    arguments = params.arguments
+    return _DISPATCH.get(arguments.get("unit"), _handler_c)(
+        params, arguments.get("location", "Unknown Location"))